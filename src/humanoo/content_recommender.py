@@ -18,6 +18,23 @@ class Recommendation:
     reasons: list[str]
 
 
+def _top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the k highest scores, best first.
+    
+    Uses an O(N) partition to find the cutoff, then sorts only the items at or
+    above it. Ties keep catalog order, matching a stable descending sort.
+    """
+    k = max(0, min(k, scores.size))
+    if k == 0:
+        return np.empty(0, dtype=np.intp)
+    
+    cutoff = np.partition(scores, scores.size - k)[scores.size - k]
+    candidates = np.flatnonzero(scores >= cutoff)
+    
+    return candidates[np.argsort(-scores[candidates], kind="stable")][:k]
+
+
 class ContentRecommender:
     """
     Hybrid recommender combining:
@@ -33,6 +50,11 @@ class ContentRecommender:
         "build_strength": ["strength", "fitness"],
     }
     
+    # Hashed lookups for per-item membership checks
+    GOAL_CATEGORY_SETS = {goal: frozenset(cats) for goal, cats in GOAL_CATEGORY_MAP.items()}
+    
+    DIFFICULTY_SCORES = {"beginner": 1.0, "intermediate": 0.6, "advanced": 0.3}
+    
     def __init__(
         self,
         content_df: pd.DataFrame,
@@ -54,11 +76,19 @@ class ContentRecommender:
         self.interactions_df = interactions_df
         self.labels_df = labels_df
         
+        # Content records keyed by id
+        self._content_records = {
+            record["content_id"]: record for record in content_df.to_dict(orient="records")
+        }
+        
         # Precompute retention lift scores
         self._compute_retention_scores()
         
         # Precompute similar user patterns
         self._compute_user_patterns()
+        
+        # Precompute per-item scoring inputs for vectorized recommend()
+        self._compute_content_arrays()
     
     def _compute_retention_scores(self):
         """Compute retention lift for each content item."""
@@ -67,15 +97,18 @@ class ContentRecommender:
         
         if self.content_performance is not None:
             # Normalize retention rate to 0-1 score
-            min_ret = self.content_performance["retention_rate"].min()
-            max_ret = self.content_performance["retention_rate"].max()
+            retention = self.content_performance["retention_rate"]
+            min_ret = retention.min()
+            max_ret = retention.max()
             
-            for _, row in self.content_performance.iterrows():
-                if max_ret > min_ret:
-                    score = (row["retention_rate"] - min_ret) / (max_ret - min_ret)
-                else:
-                    score = 0.5
-                self.retention_scores[row["content_id"]] = score
+            if max_ret > min_ret:
+                scores = (retention.to_numpy(dtype=np.float64) - min_ret) / (max_ret - min_ret)
+            else:
+                scores = np.full(len(retention), 0.5)
+            
+            self.retention_scores = dict(
+                zip(self.content_performance["content_id"].tolist(), scores.tolist())
+            )
         
         # Default score for content not in performance data
         self.default_retention_score = 0.5
@@ -89,13 +122,17 @@ class ContentRecommender:
             return
         
         # Focus on retained users' first sessions
-        retained_users = self.labels_df[~self.labels_df["churned"]]["user_id"].tolist()
-        
-        retained_interactions = self.interactions_df[
-            (self.interactions_df["user_id"].isin(retained_users)) &
-            (self.interactions_df["day_number"] == 0) &  # First session
-            (self.interactions_df["completed"] == True)  # Completed content
-        ]
+        retained_users = set(self.labels_df.loc[~self.labels_df["churned"], "user_id"])
+        
+        # Cheap numeric masks first, combined into one; the hash-set membership
+        # test then only runs on completed first-session rows
+        interactions = self.interactions_df
+        first_session_completed = (
+            (interactions["day_number"].to_numpy() == 0) &  # First session
+            (interactions["completed"].to_numpy() == True)  # Completed content
+        )
+        candidates = interactions.loc[first_session_completed, ["user_id", "content_id"]]
+        retained_interactions = candidates[candidates["user_id"].isin(retained_users)]
         
         if len(retained_interactions) == 0:
             return
@@ -107,11 +144,58 @@ class ContentRecommender:
         )
         
         # Count category preferences (simplified - in practice we'd join with user goals)
-        category_counts = merged.groupby("category")["content_id"].count()
+        category_counts = merged.groupby("category", observed=True)["content_id"].count()
         total = category_counts.sum()
         
         self.popular_categories = (category_counts / total).to_dict()
     
+    def _compute_content_arrays(self):
+        """Precompute per-item scoring inputs as arrays aligned with content_df."""
+        
+        self._content_ids = self.content_df["content_id"].to_numpy()
+        self._content_index = pd.Index(self._content_ids)
+        
+        # Integer category codes for goal matching
+        categories = pd.Categorical(self.content_df["category"])
+        self._category_codes = categories.codes
+        self._goal_category_codes = {}
+        for goal, goal_categories in self.GOAL_CATEGORY_MAP.items():
+            codes = categories.categories.get_indexer(goal_categories)
+            self._goal_category_codes[goal] = codes[codes >= 0]
+        
+        self._retention_array = (
+            self.content_df["content_id"].map(self.retention_scores)
+            .fillna(self.default_retention_score)
+            .to_numpy(dtype=np.float64)
+        )
+        
+        # Completion-friendly score, same formula as score_content()
+        durations = self.content_df["duration_minutes"].to_numpy(dtype=np.float64)
+        duration_score = np.maximum(0, 1 - (durations - 5) / 30)
+        difficulty = self.content_df["difficulty"]
+        difficulty_score = difficulty.map(self.DIFFICULTY_SCORES).to_numpy(dtype=np.float64, na_value=0.5)
+        self._completion_scores = (duration_score + difficulty_score) / 2
+        self._easy_to_complete = (difficulty == "beginner").to_numpy() & (durations <= 15)
+        
+        # (goal, weights) -> (goal mask, score before freshness), filled lazily
+        self._base_score_cache = {}
+    
+    def _goal_base_scores(self, user_goal: str, weights: dict) -> tuple[np.ndarray, np.ndarray]:
+        """Goal mask and freshness-independent score vector, cached per goal and weights."""
+        
+        key = (user_goal, tuple(sorted(weights.items())))
+        if key not in self._base_score_cache:
+            goal_codes = self._goal_category_codes.get(user_goal, [])
+            aligned = np.isin(self._category_codes, goal_codes)
+            base_scores = (
+                np.where(aligned, weights["goal_alignment"], 0.0)
+                + weights["retention_lift"] * self._retention_array
+                + weights["completion_friendly"] * self._completion_scores
+            )
+            self._base_score_cache[key] = (aligned, base_scores)
+        
+        return self._base_score_cache[key]
+    
     def score_content(
         self,
         content_id: str,
@@ -136,13 +220,13 @@ class ContentRecommender:
                 "freshness": 0.15,
             }
         
-        content = self.content_df[self.content_df["content_id"] == content_id].iloc[0]
+        content = self._content_records[content_id]
         
         score = 0.0
         reasons = []
         
         # 1. Goal alignment
-        preferred_categories = self.GOAL_CATEGORY_MAP.get(user_goal, [])
+        preferred_categories = self.GOAL_CATEGORY_SETS.get(user_goal, frozenset())
         if content["category"] in preferred_categories:
             score += weights["goal_alignment"]
             reasons.append(f"Matches your {user_goal} goal")
@@ -155,7 +239,7 @@ class ContentRecommender:
         
         # 3. Completion-friendly (shorter, beginner content for new users)
         duration_score = max(0, 1 - (content["duration_minutes"] - 5) / 30)  # Prefer 5-15 min
-        difficulty_score = {"beginner": 1.0, "intermediate": 0.6, "advanced": 0.3}.get(content["difficulty"], 0.5)
+        difficulty_score = self.DIFFICULTY_SCORES.get(content["difficulty"], 0.5)
         completion_score = (duration_score + difficulty_score) / 2
         score += weights["completion_friendly"] * completion_score
         if content["difficulty"] == "beginner" and content["duration_minutes"] <= 15:
@@ -209,22 +293,40 @@ class ContentRecommender:
                 "freshness": 0.25,
             }
         
-        # Score all content
-        scores = []
-        for _, content in self.content_df.iterrows():
-            content_id = content["content_id"]
-            score, reasons = self.score_content(content_id, user_goal, seen_content, weights)
-            scores.append(Recommendation(content_id=content_id, score=score, reasons=reasons))
-        
-        # Sort by score and return top N
-        scores.sort(key=lambda x: x.score, reverse=True)
-        
-        return scores[:n_recommendations]
+        # Score all content at once (same terms as score_content); only the
+        # freshness term depends on the user's history
+        aligned, base_scores = self._goal_base_scores(user_goal, weights)
+        seen = np.zeros(len(self._content_ids), dtype=bool)
+        seen_ids = list(seen_content)
+        if seen_ids:
+            # Positions of the seen ids in the catalog
+            positions = self._content_index.get_indexer_for(seen_ids)
+            seen[positions[positions >= 0]] = True
+        
+        scores = base_scores + np.where(seen, -weights["freshness"], weights["freshness"] * 0.5)
+        
+        # Select top N
+        top_idx = _top_k_indices(scores, n_recommendations)
+        
+        recommendations = []
+        for i in top_idx:
+            reasons = []
+            if aligned[i]:
+                reasons.append(f"Matches your {user_goal} goal")
+            if self._retention_array[i] > 0.7:
+                reasons.append("High retention content")
+            if self._easy_to_complete[i]:
+                reasons.append("Easy to complete")
+            recommendations.append(
+                Recommendation(content_id=self._content_ids[i], score=float(scores[i]), reasons=reasons)
+            )
+        
+        return recommendations
     
     def explain_recommendation(self, rec: Recommendation) -> str:
         """Generate human-readable explanation for a recommendation."""
         
-        content = self.content_df[self.content_df["content_id"] == rec.content_id].iloc[0]
+        content = self._content_records[rec.content_id]
         
         explanation = f"**{content['title']}**\n"
         explanation += f"  Category: {content['category']} | Format: {content['format']} | {content['duration_minutes']} min\n"
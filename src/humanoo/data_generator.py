@@ -4,75 +4,109 @@ Synthetic data generation for wellness app users, content, and interactions.
 
 import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import datetime
+from types import MappingProxyType
+from typing import Optional
 
-np.random.seed(42)
+DEFAULT_SEED = 42
 
 
 # Constants
 GOALS = ["weight_loss", "stress_reduction", "better_sleep", "build_strength"]
 CONTENT_CATEGORIES = ["fitness", "meditation", "sleep", "nutrition", "strength"]
 CONTENT_FORMATS = ["video", "audio", "article"]
+DIFFICULTY_LEVELS = ["beginner", "intermediate", "advanced"]
 
+# Map goals to relevant categories (read-only)
+GOAL_CATEGORY_MAP = MappingProxyType({
+    "weight_loss": ("fitness", "nutrition"),
+    "stress_reduction": ("meditation", "sleep"),
+    "better_sleep": ("sleep", "meditation"),
+    "build_strength": ("strength", "fitness"),
+})
 
-def generate_content_library(n_items: int = 50) -> pd.DataFrame:
+
+def generate_content_library(
+    n_items: int = 50,
+    rng: Optional[np.random.Generator] = None,
+) -> pd.DataFrame:
     """Generate a content library with various wellness content."""
     
-    # Map goals to relevant categories
-    goal_category_map = {
-        "weight_loss": ["fitness", "nutrition"],
-        "stress_reduction": ["meditation", "sleep"],
-        "better_sleep": ["sleep", "meditation"],
-        "build_strength": ["strength", "fitness"],
-    }
+    if rng is None:
+        rng = np.random.default_rng(DEFAULT_SEED)
+    
+    # Draw each column in one vectorized call
+    categories = rng.choice(CONTENT_CATEGORIES, size=n_items)
+    
+    # Duration varies by format and category
+    base_duration = {"fitness": 15, "meditation": 10, "sleep": 20, "nutrition": 5, "strength": 20}
+    durations = pd.Series(categories).map(base_duration).to_numpy() * rng.uniform(0.5, 1.5, size=n_items)
+    
+    # Simulate content quality (affects completion rates)
+    quality_scores = rng.beta(5, 2, size=n_items)  # Skewed toward higher quality
     
-    items = []
-    for i in range(n_items):
-        category = np.random.choice(CONTENT_CATEGORIES)
-        
-        # Duration varies by format and category
-        base_duration = {"fitness": 15, "meditation": 10, "sleep": 20, "nutrition": 5, "strength": 20}
-        duration = int(base_duration[category] * np.random.uniform(0.5, 1.5))
-        
-        # Simulate content quality (affects completion rates)
-        quality_score = np.random.beta(5, 2)  # Skewed toward higher quality
-        
-        items.append({
-            "content_id": f"c_{i:03d}",
-            "category": category,
-            "format": np.random.choice(CONTENT_FORMATS, p=[0.5, 0.3, 0.2]),
-            "duration_minutes": duration,
-            "difficulty": np.random.choice(["beginner", "intermediate", "advanced"], p=[0.4, 0.4, 0.2]),
-            "quality_score": quality_score,  # Hidden attribute affecting engagement
-            "title": f"{category.title()} Session {i+1}",
-        })
-    
-    return pd.DataFrame(items)
+    # Low-cardinality string columns are stored as categoricals (integer codes)
+    return pd.DataFrame({
+        "content_id": [f"c_{i:03d}" for i in range(n_items)],
+        "category": pd.Categorical(categories, categories=CONTENT_CATEGORIES),
+        "format": pd.Categorical(
+            rng.choice(CONTENT_FORMATS, size=n_items, p=[0.5, 0.3, 0.2]),
+            categories=CONTENT_FORMATS,
+        ),
+        "duration_minutes": durations.astype(np.int16),
+        "difficulty": pd.Categorical(
+            rng.choice(DIFFICULTY_LEVELS, size=n_items, p=[0.4, 0.4, 0.2]),
+            categories=DIFFICULTY_LEVELS,
+        ),
+        "quality_score": quality_scores.astype(np.float32),  # Hidden attribute affecting engagement
+        "title": [f"{category.title()} Session {i+1}" for i, category in enumerate(categories)],
+    })
 
 
-def generate_users(n_users: int = 500) -> pd.DataFrame:
+def generate_users(
+    n_users: int = 500,
+    rng: Optional[np.random.Generator] = None,
+) -> pd.DataFrame:
     """Generate synthetic user profiles."""
     
-    users = []
-    for i in range(n_users):
-        age = int(np.random.normal(35, 12))
-        age = max(18, min(70, age))
-        
-        users.append({
-            "user_id": f"u_{i:05d}",
-            "goal": np.random.choice(GOALS),
-            "age": age,
-            "gender": np.random.choice(["M", "F", "Other"], p=[0.45, 0.50, 0.05]),
-            "signup_date": datetime(2024, 10, 1) + timedelta(days=np.random.randint(0, 30)),
-        })
-    
-    return pd.DataFrame(users)
+    if rng is None:
+        rng = np.random.default_rng(DEFAULT_SEED)
+    
+    ages = np.clip(rng.normal(35, 12, size=n_users).astype(int), 18, 70)
+    signup_offsets = rng.integers(0, 30, size=n_users)
+    
+    return pd.DataFrame({
+        "user_id": [f"u_{i:05d}" for i in range(n_users)],
+        "goal": pd.Categorical(rng.choice(GOALS, size=n_users), categories=GOALS),
+        "age": ages.astype(np.int8),
+        "gender": rng.choice(["M", "F", "Other"], size=n_users, p=[0.45, 0.50, 0.05]),
+        "signup_date": datetime(2024, 10, 1) + pd.to_timedelta(signup_offsets, unit="D"),
+    })
+
+
+def build_goal_aligned_index(content_df: pd.DataFrame) -> dict:
+    """Row positions of goal-aligned content in content_df, keyed by goal."""
+    
+    # Goal x distinct-category alignment, gathered out to every content row;
+    # the extra last column is False so missing categories (code -1) never align
+    goals = list(GOAL_CATEGORY_MAP)
+    category_codes, categories = pd.factorize(content_df["category"])
+    goal_category_table = np.zeros((len(goals), len(categories) + 1), dtype=bool)
+    for g, goal in enumerate(goals):
+        goal_category_table[g, :-1] = [category in GOAL_CATEGORY_MAP[goal] for category in categories]
+    
+    return {
+        goal: np.flatnonzero(goal_category_table[g, category_codes])
+        for g, goal in enumerate(goals)
+    }
 
 
 def simulate_user_sessions(
     users_df: pd.DataFrame,
     content_df: pd.DataFrame,
-    simulation_days: int = 21
+    simulation_days: int = 21,
+    rng: Optional[np.random.Generator] = None,
+    goal_aligned_index: Optional[dict] = None,
 ) -> pd.DataFrame:
     """
     Simulate user content interactions with realistic engagement patterns.
@@ -82,102 +116,105 @@ def simulate_user_sessions(
     - Completion rate depends on content quality, duration, and user-content fit
     - Engagement decays over time (churn simulation)
     - Some users retain, some churn
+    
+    goal_aligned_index can be passed from build_goal_aligned_index to reuse
+    the per-goal content pools across calls on the same library.
     """
     
-    goal_category_map = {
-        "weight_loss": ["fitness", "nutrition"],
-        "stress_reduction": ["meditation", "sleep"],
-        "better_sleep": ["sleep", "meditation"],
-        "build_strength": ["strength", "fitness"],
-    }
+    if rng is None:
+        rng = np.random.default_rng(DEFAULT_SEED)
+    if goal_aligned_index is None:
+        goal_aligned_index = build_goal_aligned_index(content_df)
+    
+    # The simulation works on (user, day) and per-pick arrays
+    n_users = len(users_df)
+    days = np.arange(simulation_days)
+    
+    # Goal-aligned content pools
+    goals = list(GOAL_CATEGORY_MAP)
+    goal_ids = pd.Categorical(users_df["goal"], categories=goals).codes
+    pools = [goal_aligned_index[goal] for goal in goals]
+    
+    # Pools in CSR form: goal g owns pool_items[pool_start[g]:pool_start[g] + pool_size[g]]
+    pool_items = np.concatenate(pools).astype(np.intp)
+    pool_size = np.array([len(pool) for pool in pools])
+    pool_start = np.concatenate([[0], np.cumsum(pool_size)[:-1]])
+    pool_keys = np.repeat(np.arange(len(goals)), pool_size) * len(content_df) + pool_items  # goal * n_content + item
+    
+    # User-level engagement propensity (some users are more engaged)
+    base_engagement = rng.beta(2, 2, size=n_users)  # 0-1, centered around 0.5
     
-    interactions = []
-    
-    for _, user in users_df.iterrows():
-        user_id = user["user_id"]
-        user_goal = user["goal"]
-        signup = user["signup_date"]
-        
-        # User-level engagement propensity (some users are more engaged)
-        base_engagement = np.random.beta(2, 2)  # 0-1, centered around 0.5
-        
-        # Determine if user will churn (for labeling purposes)
-        # Higher base_engagement = less likely to churn
-        churn_prob = 0.7 - (base_engagement * 0.5)  # 20%-70% churn probability
-        will_churn = np.random.random() < churn_prob
-        churn_day = np.random.randint(3, 14) if will_churn else None
-        
-        # Simulate daily activity
-        for day in range(simulation_days):
-            current_date = signup + timedelta(days=day)
-            
-            # Check if user has churned
-            if will_churn and day >= churn_day:
-                # Small chance of return after churn
-                if np.random.random() > 0.05:
-                    continue
-            
-            # Daily engagement probability (decays over time for non-retained users)
-            if will_churn:
-                decay_factor = max(0.1, 1 - (day / churn_day) * 0.5)
-            else:
-                decay_factor = min(1.2, 1 + day * 0.02)  # Retained users slightly increase
-            
-            daily_prob = base_engagement * decay_factor * 0.6
-            
-            if np.random.random() > daily_prob:
-                continue  # No session today
-            
-            # Number of content pieces this session
-            n_content = np.random.choice([1, 2, 3], p=[0.5, 0.35, 0.15])
-            
-            # Select content
-            preferred_categories = goal_category_map[user_goal]
-            
-            for _ in range(n_content):
-                # 70% chance to pick goal-aligned content
-                if np.random.random() < 0.7:
-                    aligned_content = content_df[content_df["category"].isin(preferred_categories)]
-                    if len(aligned_content) > 0:
-                        content = aligned_content.sample(1).iloc[0]
-                    else:
-                        content = content_df.sample(1).iloc[0]
-                else:
-                    content = content_df.sample(1).iloc[0]
-                
-                # Calculate completion probability
-                # Factors: content quality, duration, goal alignment
-                is_aligned = content["category"] in preferred_categories
-                
-                completion_prob = (
-                    0.3  # Base
-                    + content["quality_score"] * 0.3  # Quality boost
-                    + (0.2 if is_aligned else 0)  # Alignment boost
-                    - (content["duration_minutes"] / 60) * 0.2  # Duration penalty
-                    + base_engagement * 0.2  # User engagement factor
-                )
-                completion_prob = max(0.1, min(0.95, completion_prob))
-                
-                completed = np.random.random() < completion_prob
-                
-                # Time spent
-                if completed:
-                    time_spent = content["duration_minutes"] * np.random.uniform(0.9, 1.1)
-                else:
-                    # Partial completion
-                    time_spent = content["duration_minutes"] * np.random.uniform(0.1, 0.7)
-                
-                interactions.append({
-                    "user_id": user_id,
-                    "content_id": content["content_id"],
-                    "date": current_date,
-                    "day_number": day,
-                    "completed": completed,
-                    "time_spent_minutes": round(time_spent, 1),
-                    "session_number": day + 1,  # Simplified: 1 session per active day
-                })
-    
-    return pd.DataFrame(interactions)
+    # Determine if user will churn (for labeling purposes)
+    # Higher base_engagement = less likely to churn
+    churn_prob = 0.7 - (base_engagement * 0.5)  # 20%-70% churn probability
+    will_churn = rng.random(n_users) < churn_prob
+    churn_day = np.where(will_churn, rng.integers(3, 14, size=n_users), 1)
+    
+    # Churned users are gone from churn_day on, apart from a small chance of return
+    after_churn = will_churn[:, None] & (days >= churn_day[:, None])
+    returned = rng.random((n_users, simulation_days)) <= 0.05
+    
+    # Daily engagement probability (decays over time for non-retained users)
+    decay_factor = np.where(
+        will_churn[:, None],
+        np.maximum(0.1, 1 - (days / churn_day[:, None]) * 0.5),
+        np.minimum(1.2, 1 + days * 0.02),  # Retained users slightly increase
+    )
+    daily_prob = base_engagement[:, None] * decay_factor * 0.6
+    
+    active = (~after_churn | returned) & (rng.random((n_users, simulation_days)) <= daily_prob)
+    session_user, session_day = np.nonzero(active)  # user-major, day-minor order
+    
+    # Number of content pieces per session, expanded to one row per pick
+    n_content = rng.choice([1, 2, 3], size=len(session_user), p=[0.5, 0.35, 0.15])
+    pick_user = np.repeat(session_user, n_content)
+    pick_day = np.repeat(session_day, n_content)
+    pick_goal = goal_ids[pick_user]
+    n_picks = len(pick_user)
+    
+    # Select content: 70% chance to pick goal-aligned content, otherwise any item
+    content_idx = rng.integers(0, len(content_df), size=n_picks)
+    wants_aligned = rng.random(n_picks) < 0.7
+    aligned_picks = np.flatnonzero(wants_aligned & (pick_goal >= 0))
+    aligned_picks = aligned_picks[pool_size[pick_goal[aligned_picks]] > 0]
+    aligned_goal = pick_goal[aligned_picks]
+    offset = (rng.random(len(aligned_picks)) * pool_size[aligned_goal]).astype(np.intp)
+    content_idx[aligned_picks] = pool_items[pool_start[aligned_goal] + offset]
+    
+    # Calculate completion probability
+    # Factors: content quality, duration, goal alignment
+    quality = content_df["quality_score"].to_numpy(dtype=np.float64)[content_idx]
+    duration = content_df["duration_minutes"].to_numpy(dtype=np.float64)[content_idx]
+    pick_keys = pick_goal.astype(np.intp) * len(content_df) + content_idx
+    is_aligned = (pick_goal >= 0) & np.isin(pick_keys, pool_keys)
+    
+    # Accumulated in place
+    completion_prob = quality * 0.3  # Quality boost
+    completion_prob += 0.3  # Base
+    completion_prob += is_aligned * 0.2  # Alignment boost
+    completion_prob -= duration * (0.2 / 60)  # Duration penalty
+    completion_prob += base_engagement[pick_user] * 0.2  # User engagement factor
+    np.clip(completion_prob, 0.1, 0.95, out=completion_prob)
+    
+    completed = rng.random(n_picks) < completion_prob
+    
+    # Time spent: U(0.9, 1.1) of duration when completed, U(0.1, 0.7) otherwise
+    fraction_low = np.where(completed, 0.9, 0.1)
+    fraction_width = np.where(completed, 0.2, 0.6)
+    time_spent = duration * (fraction_low + fraction_width * rng.random(n_picks))
+    
+    signup = pd.to_datetime(users_df["signup_date"]).to_numpy()
+    
+    # Narrow integer dtypes (days < 32k); time_spent_minutes stays float64 to keep its rounding
+    return pd.DataFrame({
+        "user_id": users_df["user_id"].to_numpy()[pick_user],
+        "content_id": content_df["content_id"].to_numpy()[content_idx],
+        "date": signup[pick_user] + pd.to_timedelta(pick_day, unit="D").to_numpy(),
+        "day_number": pick_day.astype(np.int16),
+        "completed": completed,
+        "time_spent_minutes": np.round(time_spent, 1),
+        "session_number": (pick_day + 1).astype(np.int16),  # Simplified: 1 session per active day
+    })
 
 
 def compute_user_features(
@@ -191,56 +228,59 @@ def compute_user_features(
     These features are used for churn analysis.
     """
     
-    # Filter interactions to observation window
-    obs_interactions = interactions_df[interactions_df["day_number"] <= as_of_day]
-    
-    features = []
-    
-    for _, user in users_df.iterrows():
-        user_id = user["user_id"]
-        user_ints = obs_interactions[obs_interactions["user_id"] == user_id]
-        
-        if len(user_ints) == 0:
-            # No interactions - high churn risk
-            features.append({
-                "user_id": user_id,
-                "goal": user["goal"],
-                "total_sessions": 0,
-                "total_content_views": 0,
-                "total_time_minutes": 0,
-                "completion_rate": 0,
-                "avg_time_per_content": 0,
-                "unique_days_active": 0,
-                "days_since_last_activity": as_of_day,
-                "first_session_completions": 0,
-                "category_diversity": 0,
-            })
-        else:
-            # Merge with content info
-            user_ints = user_ints.merge(content_df[["content_id", "category"]], on="content_id")
-            
-            total_views = len(user_ints)
-            completions = user_ints["completed"].sum()
-            
-            # First session metrics (day 0)
-            first_session = user_ints[user_ints["day_number"] == 0]
-            first_session_completions = first_session["completed"].sum() if len(first_session) > 0 else 0
-            
-            features.append({
-                "user_id": user_id,
-                "goal": user["goal"],
-                "total_sessions": user_ints["day_number"].nunique(),
-                "total_content_views": total_views,
-                "total_time_minutes": user_ints["time_spent_minutes"].sum(),
-                "completion_rate": completions / total_views if total_views > 0 else 0,
-                "avg_time_per_content": user_ints["time_spent_minutes"].mean(),
-                "unique_days_active": user_ints["day_number"].nunique(),
-                "days_since_last_activity": as_of_day - user_ints["day_number"].max(),
-                "first_session_completions": first_session_completions,
-                "category_diversity": user_ints["category"].nunique(),
-            })
-    
-    return pd.DataFrame(features)
+    # Filter interactions to observation window and attach content category
+    obs = interactions_df.loc[
+        interactions_df["day_number"] <= as_of_day,
+        ["user_id", "content_id", "day_number", "completed", "time_spent_minutes"],
+    ]
+    obs = obs.merge(content_df[["content_id", "category"]], on="content_id")
+    obs["first_session_completed"] = obs["completed"] & (obs["day_number"] == 0)
+    
+    # Per-user aggregates
+    agg = obs.groupby("user_id").agg(
+        total_sessions=("day_number", "nunique"),
+        total_content_views=("completed", "size"),
+        total_time_minutes=("time_spent_minutes", "sum"),
+        completions=("completed", "sum"),
+        avg_time_per_content=("time_spent_minutes", "mean"),
+        last_active_day=("day_number", "max"),
+        first_session_completions=("first_session_completed", "sum"),
+        category_diversity=("category", "nunique"),
+    )
+    agg["completion_rate"] = agg["completions"] / agg["total_content_views"]
+    agg["unique_days_active"] = agg["total_sessions"]
+    agg["days_since_last_activity"] = as_of_day - agg["last_active_day"]
+    
+    # Users without interactions get zeros - high churn risk
+    features = users_df[["user_id", "goal"]].merge(agg, on="user_id", how="left")
+    features["days_since_last_activity"] = features["days_since_last_activity"].fillna(as_of_day)
+    # Only the aggregated columns; fillna(0) on the categorical goal raises on pandas 2.x
+    agg_columns = list(agg.columns)
+    features[agg_columns] = features[agg_columns].fillna(0)
+    
+    count_columns = [
+        "total_sessions",
+        "total_content_views",
+        "unique_days_active",
+        "days_since_last_activity",
+        "first_session_completions",
+        "category_diversity",
+    ]
+    features[count_columns] = features[count_columns].astype(int)
+    
+    return features[[
+        "user_id",
+        "goal",
+        "total_sessions",
+        "total_content_views",
+        "total_time_minutes",
+        "completion_rate",
+        "avg_time_per_content",
+        "unique_days_active",
+        "days_since_last_activity",
+        "first_session_completions",
+        "category_diversity",
+    ]]
 
 
 def label_churn(
@@ -257,32 +297,41 @@ def label_churn(
     Retained = at least min_activity_threshold interactions in churn window
     """
     
-    churn_window = interactions_df[
-        (interactions_df["day_number"] >= churn_window_start) &
-        (interactions_df["day_number"] <= churn_window_end)
-    ]
+    day_number = interactions_df["day_number"].to_numpy()
+    in_window = (day_number >= churn_window_start) & (day_number <= churn_window_end)
     
-    activity_in_window = churn_window.groupby("user_id").size().reset_index(name="activity_count")
+    # Count in-window activity per distinct user by integer position; interactions
+    # from users not in users_df get -1 and are dropped. Counts are gathered back
+    # per row, so a duplicated user_id yields one row per occurrence
+    user_ids = users_df["user_id"].to_numpy()
+    row_codes, unique_ids = pd.Index(user_ids).factorize()
+    user_codes = unique_ids.get_indexer(interactions_df["user_id"])
+    in_window &= user_codes >= 0
+    activity_count = np.bincount(user_codes[in_window], minlength=len(unique_ids))[row_codes]
     
-    labels = users_df[["user_id"]].copy()
-    labels = labels.merge(activity_in_window, on="user_id", how="left")
-    labels["activity_count"] = labels["activity_count"].fillna(0)
-    labels["churned"] = labels["activity_count"] < min_activity_threshold
-    
-    return labels[["user_id", "churned"]]
+    return pd.DataFrame({
+        "user_id": user_ids,
+        "churned": activity_count < min_activity_threshold,
+    })
 
 
-def generate_dataset(n_users: int = 500, n_content: int = 50):
+def generate_dataset(n_users: int = 500, n_content: int = 50, seed: int = DEFAULT_SEED):
     """Generate complete dataset for analysis."""
     
+    # One generator shared by every step keeps the whole dataset reproducible from `seed`
+    rng = np.random.default_rng(seed)
+    
     print("Generating content library...")
-    content_df = generate_content_library(n_content)
+    content_df = generate_content_library(n_content, rng=rng)
+    goal_aligned_index = build_goal_aligned_index(content_df)
     
     print("Generating users...")
-    users_df = generate_users(n_users)
+    users_df = generate_users(n_users, rng=rng)
     
     print("Simulating user sessions...")
-    interactions_df = simulate_user_sessions(users_df, content_df)
+    interactions_df = simulate_user_sessions(
+        users_df, content_df, rng=rng, goal_aligned_index=goal_aligned_index
+    )
     
     print("Computing user features (as of day 7)...")
     features_df = compute_user_features(users_df, interactions_df, content_df, as_of_day=7)
@@ -3,11 +3,22 @@ Logging configuration for the Humanoo Wellness Assistant.
 """
 
 import logging
+import logging.handlers
 import sys
 from pathlib import Path
 from datetime import datetime
 
 
+class _BufferedFileHandler(logging.handlers.MemoryHandler):
+    """MemoryHandler that also closes its target file handler on close."""
+    
+    def close(self):
+        target = self.target
+        super().close()  # Flushes the buffer into target first
+        if target is not None:
+            target.close()
+
+
 def setup_logging(
     log_dir: str = "logs",
     log_level: int = logging.INFO,
@@ -36,7 +47,9 @@ def setup_logging(
     logger = logging.getLogger("humanoo")
     logger.setLevel(log_level)
     
-    # Clear any existing handlers
+    # Clear any existing handlers, flushing and closing them first
+    for handler in logger.handlers:
+        handler.close()
     logger.handlers = []
     
     # File handler - detailed format
@@ -47,7 +60,15 @@ def setup_logging(
         datefmt="%Y-%m-%d %H:%M:%S"
     )
     file_handler.setFormatter(file_format)
-    logger.addHandler(file_handler)
+    
+    # Buffer file records; warnings and errors flush immediately, the rest at capacity/exit
+    buffered_handler = _BufferedFileHandler(
+        capacity=1024,
+        flushLevel=logging.WARNING,
+        target=file_handler,
+    )
+    buffered_handler.setLevel(log_level)
+    logger.addHandler(buffered_handler)
     
     # Console handler - simpler format
     if include_console:
@@ -57,7 +78,7 @@ def setup_logging(
         console_handler.setFormatter(console_format)
         logger.addHandler(console_handler)
     
-    logger.info(f"Logging initialized. Log file: {log_file}")
+    logger.info("Logging initialized. Log file: %s", log_file)
     
     return logger
 
@@ -1,5 +1,7 @@
 """Main demo script for the Humanoo churn analysis and recommendation engine."""
 
+import pandas as pd
+
 from humanoo.data_generator import generate_dataset
 from humanoo.churn_analysis import run_churn_analysis
 from humanoo.content_recommender import ContentRecommender
@@ -20,10 +22,10 @@ def main():
     # Step 1: Generate synthetic data
     logger.info("\n[Step 1] Generating synthetic dataset...")
     data = generate_dataset(n_users=500, n_content=50)
-    logger.info(f"  - Users: {len(data['users'])}")
-    logger.info(f"  - Content items: {len(data['content'])}")
-    logger.info(f"  - Interactions: {len(data['interactions'])}")
-    logger.info(f"  - Churn rate: {data['labels']['churned'].mean():.1%}")
+    logger.info("  - Users: %d", len(data["users"]))
+    logger.info("  - Content items: %d", len(data["content"]))
+    logger.info("  - Interactions: %d", len(data["interactions"]))
+    logger.info("  - Churn rate: %.1f%%", data["labels"]["churned"].mean() * 100)
     
     # Step 2: Run churn analysis
     logger.info("\n[Step 2] Running churn analysis...")
@@ -34,19 +36,19 @@ def main():
     # Sort by absolute correlation
     correlations_df["abs_corr"] = correlations_df["correlation_with_churn"].abs()
     top_corrs = correlations_df.nlargest(5, "abs_corr")
-    for _, row in top_corrs.iterrows():
-        logger.info(f"  - {row['feature']}: {row['correlation_with_churn']:+.3f}")
+    for feature, corr in zip(top_corrs["feature"], top_corrs["correlation_with_churn"]):
+        logger.info("  - %s: %+.3f", feature, corr)
     
     logger.info("\nRandom Forest feature importance:")
     importance = analysis_results["model_results"]["feature_importance"]
     for feature, imp in sorted(importance.items(), key=lambda x: x[1], reverse=True)[:5]:
-        logger.info(f"  - {feature}: {imp:.3f}")
+        logger.info("  - %s: %.3f", feature, imp)
     
-    logger.info(f"\nModel ROC AUC: {analysis_results['model_results']['roc_auc']:.3f}")
+    logger.info("\nModel ROC AUC: %.3f", analysis_results["model_results"]["roc_auc"])
     
     # Save analysis results
     saved_paths = results_manager.save_churn_results(analysis_results)
-    logger.info(f"  Analysis results saved to: {results_manager.run_dir}")
+    logger.info("  Analysis results saved to: %s", results_manager.run_dir)
     
     # Step 3: Demonstrate content recommendations
     logger.info("\n[Step 3] Content recommendation demo...")
@@ -62,31 +64,39 @@ def main():
         {"user_id": "demo_3", "goal": "better_sleep", "session_number": 5},
     ]
     
-    all_recommendations = []
+    # One list per output column, built into a table at the end
+    rec_columns = {
+        column: []
+        for column in ("user_id", "goal", "session", "rank", "content_id", "title", "score")
+    }
     content_df = data["content"]
+    # Titles keyed by content id
+    title_by_id = dict(zip(content_df["content_id"].to_numpy(), content_df["title"].to_numpy()))
     for user in demo_users:
-        logger.info(f"\nRecommendations for {user['user_id']} (goal: {user['goal']}, session: {user['session_number']}):")
+        logger.info(
+            "\nRecommendations for %s (goal: %s, session: %s):",
+            user["user_id"], user["goal"], user["session_number"],
+        )
         recs = recommender.recommend(
             user_goal=user["goal"],
             session_number=user["session_number"],
             n_recommendations=3
         )
         for i, rec in enumerate(recs, 1):
-            title = content_df[content_df["content_id"] == rec.content_id]["title"].iloc[0]
-            logger.info(f"  {i}. {title} (score: {rec.score:.3f})")
-            all_recommendations.append({
-                "user_id": user["user_id"],
-                "goal": user["goal"],
-                "session": user["session_number"],
-                "rank": i,
-                "content_id": rec.content_id,
-                "title": title,
-                "score": rec.score,
-            })
+            title = title_by_id[rec.content_id]
+            logger.info("  %d. %s (score: %.3f)", i, title, rec.score)
+            rec_columns["user_id"].append(user["user_id"])
+            rec_columns["goal"].append(user["goal"])
+            rec_columns["session"].append(user["session_number"])
+            rec_columns["rank"].append(i)
+            rec_columns["content_id"].append(rec.content_id)
+            rec_columns["title"].append(title)
+            rec_columns["score"].append(rec.score)
     
     # Save recommendations
-    results_manager.save_recommendations(all_recommendations)
-    logger.info(f"\n  Recommendations saved to: {results_manager.run_dir}")
+    recommendations_df = pd.DataFrame(rec_columns)
+    results_manager.save_recommendations(recommendations_df)
+    logger.info("\n  Recommendations saved to: %s", results_manager.run_dir)
     
     # Save summary
     summary = {
@@ -100,14 +110,14 @@ def main():
         "model_performance": {
             "roc_auc": analysis_results['model_results']['roc_auc'],
         },
-        "recommendations_generated": len(all_recommendations),
+        "recommendations_generated": len(recommendations_df),
     }
     results_manager.save_summary(summary)
     
     logger.info("\n" + "=" * 60)
     logger.info("DEMO COMPLETE")
-    logger.info(f"All outputs saved to: {results_manager.run_dir}")
-    logger.info(f"Logs saved to: logs/")
+    logger.info("All outputs saved to: %s", results_manager.run_dir)
+    logger.info("Logs saved to: logs/")
     logger.info("=" * 60)
 
 
@@ -5,14 +5,21 @@ Results persistence for saving analysis outputs.
 import json
 from pathlib import Path
 from datetime import datetime
-from typing import Any
+from typing import Any, Optional, Union
+import numpy as np
 import pandas as pd
 
 
 class ResultsManager:
     """Manages saving and loading analysis results."""
     
-    def __init__(self, output_dir: str = "output"):
+    TABLE_FORMATS = ("parquet", "csv")
+    
+    def __init__(self, output_dir: str = "output", table_format: str = "parquet"):
+        if table_format not in self.TABLE_FORMATS:
+            raise ValueError(f"table_format must be one of {self.TABLE_FORMATS}, got {table_format!r}")
+        self.table_format = table_format
+        
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
         self.timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -21,35 +28,40 @@ class ResultsManager:
         self.run_dir = self.output_dir / f"run_{self.timestamp}"
         self.run_dir.mkdir(exist_ok=True)
     
-    def save_dataframe(self, df: pd.DataFrame, name: str) -> Path:
-        """Save a DataFrame to CSV."""
-        path = self.run_dir / f"{name}.csv"
-        df.to_csv(path, index=False)
+    def save_dataframe(self, df: pd.DataFrame, name: str, fmt: Optional[str] = None) -> Path:
+        """Save a DataFrame as Parquet (columnar, snappy-compressed) or CSV."""
+        fmt = fmt or self.table_format
+        
+        if fmt == "parquet":
+            path = self.run_dir / f"{name}.parquet"
+            df.to_parquet(path, engine="pyarrow", compression="snappy", index=False)
+        elif fmt == "csv":
+            path = self.run_dir / f"{name}.csv"
+            df.to_csv(path, index=False)
+        else:
+            raise ValueError(f"fmt must be one of {self.TABLE_FORMATS}, got {fmt!r}")
+        
         return path
     
     def save_json(self, data: dict, name: str) -> Path:
         """Save a dictionary to JSON."""
         path = self.run_dir / f"{name}.json"
         
-        # Convert non-serializable types
-        serializable = self._make_serializable(data)
-        
+        # Non-JSON types are converted by the encoder hook
         with open(path, "w") as f:
-            json.dump(serializable, f, indent=2)
+            json.dump(data, f, indent=2, default=self._json_default)
         return path
     
-    def _make_serializable(self, obj: Any) -> Any:
-        """Convert objects to JSON-serializable types."""
-        if isinstance(obj, dict):
-            return {k: self._make_serializable(v) for k, v in obj.items()}
-        elif isinstance(obj, list):
-            return [self._make_serializable(v) for v in obj]
-        elif isinstance(obj, pd.DataFrame):
+    def _json_default(self, obj: Any) -> Any:
+        """Convert an object the json encoder cannot handle natively."""
+        if isinstance(obj, pd.DataFrame):
             return obj.to_dict(orient="records")
-        elif isinstance(obj, (int, float, str, bool, type(None))):
-            return obj
+        elif isinstance(obj, np.generic):
+            return obj.item()
+        elif isinstance(obj, np.ndarray):
+            return obj.tolist()
         elif hasattr(obj, "__dict__"):
-            return self._make_serializable(obj.__dict__)
+            return obj.__dict__
         else:
             return str(obj)
     
@@ -86,9 +98,12 @@ class ResultsManager:
         
         return paths
     
-    def save_recommendations(self, recommendations: list) -> Path:
-        """Save recommendations list to CSV."""
-        df = pd.DataFrame(recommendations)
+    def save_recommendations(self, recommendations: Union[pd.DataFrame, list]) -> Path:
+        """Save recommendations (a DataFrame or list of records) as a table."""
+        if isinstance(recommendations, pd.DataFrame):
+            df = recommendations
+        else:
+            df = pd.DataFrame(recommendations)
         return self.save_dataframe(df, "recommendations")
     
     def save_summary(self, summary: dict) -> Path: